@@ -1,18 +1,29 @@
-import threading
 import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import threading
 import requests
-import pandas as pd
 import os
-from flask import Flask, render_template, jsonify, request
+import shutil
+import functools
+import hmac
+from flask import Flask, Response, render_template, jsonify, request
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium_stealth import stealth
 import urllib3
 from flask_cors import CORS  # Add this
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
+from contextlib import contextmanager
+from inventory import build_targets, group_by_host
+from profiling import profiler, tracer
+from recording import body_fingerprint, recorder, replayer
+from scheduler import LANE_INTERACTIVE, LANE_RECHECK, LANE_SWEEP, ProbeScheduler, current_lane
+from results import (CheckResult, Status, failure_facets, format_ts, parse_failure_query,
+                     query_failures)
+
+# pandas and the Selenium stack are imported lazily (see _import_pandas /
+# _import_selenium) so a container restart is serving requests before the
+# Excel parser or the browser tier is ever needed.
 
 urllib3.disable_warnings()
 app = Flask(__name__)
@@ -21,17 +32,163 @@ CORS(app)  # Enable CORS for all routes
 # Global shared state
 CHECK_INTERVAL = 15 * 60
 
+# Set AUTO_START_MONITOR=0 to serve the dashboard without running checks
+AUTO_START_MONITOR = os.environ.get('AUTO_START_MONITOR', '1') != '0'
+MONITOR_LOCK_FILE = os.environ.get('MONITOR_LOCK_FILE', '/tmp/website-health-monitor.lock')
+
+# Probe workers and Chrome instances, with a share held back for operator retries
+probe_scheduler = ProbeScheduler(
+    workers=int(os.environ.get('PROBE_WORKERS', 12)),
+    reserved_workers=int(os.environ.get('INTERACTIVE_RESERVED_WORKERS', 2)),
+    browser_slots=int(os.environ.get('BROWSER_SLOTS', 3)),
+    reserved_browsers=int(os.environ.get('INTERACTIVE_RESERVED_BROWSERS', 1))
+)
+
+# Most same-host targets checked serially in one sweep task
+HOST_CHUNK_SIZE = int(os.environ.get('HOST_CHUNK_SIZE', 4))
+
+# Lean browser-probe profile for the Selenium fallback
+BROWSER_PAGE_LOAD_TIMEOUT = int(os.environ.get('BROWSER_PAGE_LOAD_TIMEOUT', 20))
+BROWSER_READY_TIMEOUT = int(os.environ.get('BROWSER_READY_TIMEOUT', 10))
+
+# Resources the probe never needs to read a title and look for challenge pages
+BROWSER_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.css',
+    '*.mp4', '*.webm', '*.mp3', '*.m3u8',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*clarity.ms*',
+]
+
+# Probe record/replay (see recording.py): record every probe to a JSONL file,
+# or serve a recorded day back through the scheduler without the network
+PROBE_RECORD_FILE = os.environ.get('PROBE_RECORD_FILE')
+PROBE_REPLAY_FILE = os.environ.get('PROBE_REPLAY_FILE')
+PROBE_REPLAY_SPEED = float(os.environ.get('PROBE_REPLAY_SPEED', 1))
+PROBE_REPLAY_LOOP = os.environ.get('PROBE_REPLAY_LOOP', '0') == '1'
+
+# Shared secret for /api/admin/* (sent as X-Admin-Token); admin routes are off when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# How long a recorded redirect chain is trusted before the listed URL is walked again
+REDIRECT_CACHE_TTL = int(os.environ.get('REDIRECT_CACHE_TTL', 6 * 60 * 60))
+
 monitoring_results = {
     'total': 0,
     'checked': 0,
-    'failed': [],
-    'last_check': None,
+    'failed': {},  # url -> CheckResult, insertion ordered
+    'failed_version': 0,  # bumped on every change to 'failed'
+    'last_check': None,  # epoch seconds
     'is_running': False,
-    'retry_in_progress': False
+    'retry_in_progress': False,
+    'generation': 0  # bumped when the data source switches between live and replay
 }
 
 results_lock = threading.Lock()
 
+# Formatted copy of the failed list, rebuilt only when failed_version moves
+_failed_payload_cache = {'version': -1, 'items': []}
+_failed_facets_cache = {'version': -1, 'facets': None}
+
+# Listed URL -> {'chain': ((status_code, url), ...), 'final_url': str, 'walked_at': epoch}
+redirect_cache = {}
+# Listed URL -> {'chain', 'final_url', 'walked_at', 'note', 'changed_at'}; kept for every
+# URL that has redirected, including after it recovers or stops redirecting
+redirect_status = {}
+redirect_lock = threading.Lock()
+
+startup_timing = {
+    'app_import_seconds': None,
+    'pandas_import_seconds': None,
+    'selenium_import_seconds': None,
+    'monitor_started_at': None,
+    'first_result_seconds': None,
+    'first_cycle_seconds': None,
+    'monitor_leader': False,
+}
+
+_bootstrap_lock = threading.Lock()
+_leader_lock_handle = None
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+
+
+def _import_pandas():
+    """Import pandas on first use and record how long it took"""
+    with _lazy_lock:
+        if 'pd' not in _lazy_modules:
+            started = time.perf_counter()
+            import pandas as pd
+            _lazy_modules['pd'] = pd
+            startup_timing['pandas_import_seconds'] = round(time.perf_counter() - started, 3)
+        return _lazy_modules['pd']
+
+
+def _import_selenium():
+    """Import the Selenium stack on first browser check and record how long it took"""
+    with _lazy_lock:
+        if 'selenium' not in _lazy_modules:
+            started = time.perf_counter()
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support import expected_conditions
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.common.exceptions import TimeoutException
+            from webdriver_manager.chrome import ChromeDriverManager
+            from selenium_stealth import stealth
+            _lazy_modules['selenium'] = {
+                'webdriver': webdriver,
+                'Options': Options,
+                'Service': Service,
+                'By': By,
+                'expected_conditions': expected_conditions,
+                'WebDriverWait': WebDriverWait,
+                'TimeoutException': TimeoutException,
+                'ChromeDriverManager': ChromeDriverManager,
+                'stealth': stealth,
+            }
+            startup_timing['selenium_import_seconds'] = round(time.perf_counter() - started, 3)
+        return _lazy_modules['selenium']
+
+
+def _chromedriver_path(ChromeDriverManager):
+    """Resolve chromedriver once: the one baked into the image, else webdriver_manager's"""
+    with _lazy_lock:
+        if 'chromedriver' not in _lazy_modules:
+            _lazy_modules['chromedriver'] = shutil.which('chromedriver') or ChromeDriverManager().install()
+        return _lazy_modules['chromedriver']
+
+
+def _browser_options(Options):
+    """Headless Chrome tuned for probing: no images/fonts/media, no caches, eager load"""
+    options = Options()
+    # Return from driver.get() at DOMContentLoaded instead of waiting for every subresource
+    options.page_load_strategy = 'eager'
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1280,720')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_argument('--disk-cache-size=1')
+    options.add_argument('--media-cache-size=1')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-background-networking')
+    options.add_argument('--disable-component-update')
+    options.add_argument('--disable-default-apps')
+    options.add_argument('--disable-sync')
+    options.add_argument('--mute-audio')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.default_content_setting_values.notifications': 2,
+    })
+    return options
+
 
 def load_websites_from_excel():
     """Load websites from Excel"""
@@ -45,16 +202,19 @@ def load_websites_from_excel():
         df = None
         for path in possible_paths:
             if os.path.exists(path):
-                df = pd.read_excel(path)
+                df = _import_pandas().read_excel(path)
                 break
 
         if df is None:
             return get_demo_websites()
 
-        websites = []
+        entries = []
         for _, row in df.iterrows():
             bu = str(row.get('BU', '')).strip()
             cell = str(row.get('Websites', '')).strip()
+            ready = str(row.get('Ready', '')).strip()
+            if ready.lower() in ['nan', 'none']:
+                ready = ''
 
             if not cell or cell.lower() in ['nan', 'none']:
                 continue
@@ -70,11 +230,10 @@ def load_websites_from_excel():
                     url = 'https://' + url
                 url = url.replace(' ', '').rstrip('/')
 
-                websites.append({
-                    'bu': bu,
-                    'url': url,
-                    'name': url.replace('https://', '').replace('http://', '').replace('www.', '')
-                })
+                entries.append((bu, url, ready or None))
+
+        # One probe target per canonical URL, owned by every BU that lists it
+        websites = build_targets(entries)
 
         return websites
     except Exception as e:
@@ -82,44 +241,174 @@ def load_websites_from_excel():
         return get_demo_websites()
 
 
-def check_website(site_info):
-    """Check website - fast method first, Selenium fallback if blocked"""
+def _fetch(http, url, headers, allow_redirects=True, attempts=3):
+    """GET with the fast path's timeout retries"""
+    for attempt in range(attempts):  # retry 3 times internally
+        try:
+            with tracer.span('http_get' if attempt == 0 else 'http_get_retry'):
+                return http.get(
+                    url,
+                    headers=headers,
+                    timeout=20,  # increased from 10 → 20
+                    verify=False,
+                    allow_redirects=allow_redirects
+                )
+        except requests.exceptions.Timeout:
+            if attempt == attempts - 1:
+                raise
+            with tracer.span('retry_backoff'):
+                time.sleep(2)  # small wait before retry
+
+
+def _cached_redirect(url):
+    """Recorded redirect chain for a listed URL and whether it is still within the TTL
+
+    Stale entries are still returned so the re-walk can be compared against them.
+    """
+    with redirect_lock:
+        entry = redirect_cache.get(url)
+        if entry is None:
+            return None, False
+        return entry, time.time() - entry['walked_at'] < REDIRECT_CACHE_TTL
+
+
+def _redirect_change(entry, response):
+    """Describe how a fresh walk differs from the recorded chain, or None"""
+    if response.url != entry['final_url']:
+        return f"Redirect changed, was {entry['final_url']}"
+    hops = tuple(r.url for r in response.history)
+    if hops != tuple(hop for _, hop in entry['chain'][:-1]):
+        return 'Redirect chain changed'
+    return None
+
+
+def _store_redirect(url, response, note=None):
+    """Record (or forget) the redirect chain a full walk just followed
+
+    The chain and the last change note also go into redirect_status, which
+    /api/redirects serves whether the site is up or down.
+    """
+    now = time.time()
+    chain = None
+    if response.history:
+        chain = tuple((r.status_code, r.url) for r in response.history)
+        chain += ((response.status_code, response.url),)
+
+    with redirect_lock:
+        if chain:
+            redirect_cache[url] = {
+                'chain': chain,
+                'final_url': response.url,
+                'walked_at': now
+            }
+        else:
+            redirect_cache.pop(url, None)
+
+        status = redirect_status.get(url)
+        if chain or note or status is not None:
+            if status is None:
+                status = redirect_status[url] = {'note': None, 'changed_at': None}
+            status['chain'] = chain
+            status['final_url'] = response.url
+            status['walked_at'] = now
+            if note:
+                status['note'] = note
+                status['changed_at'] = now
+    return chain
+
+
+def check_website(site_info, session=None):
+    """Check website - fast method first, Selenium fallback if blocked
+
+    Pass a requests.Session to reuse keep-alive connections across targets
+    on the same host (see check_host_group). In replay mode the recorded
+    result is returned instead of touching the network; only the sweep
+    advances through the recording, retries re-read the current record.
+    """
+    if replayer.active:
+        return replayer.probe(site_info, advance=current_lane() == LANE_SWEEP)
+
+    started_at = time.time()
+    started = time.perf_counter()
+    result = _probe(site_info, session)
+    if recorder.active:
+        recorder.record(site_info, result, started_at, time.perf_counter() - started)
+    return result
+
+
+def _probe(site_info, session=None):
+    """Run the fast path and, if it cannot decide, the browser tier"""
+    with tracer.trace('check', url=site_info['url']):
+        with tracer.span('fast_path'):
+            result = _check_fast(site_info, session)
+        if result is not None:
+            return result
+
+        # Step 2: Use Selenium for sites that might need JavaScript rendering
+        # BUT: We should NOT use Selenium for 403 errors - if requests got 403,
+        # Selenium will likely also be blocked or get a challenge page
+
+        print(f"   Trying Selenium for: {site_info['name']}")
+
+        # Chrome is the scarcest resource: bulk lanes cannot take the reserved slots
+        with tracer.span('browser_tier'):
+            with probe_scheduler.browser_slot():
+                with tracer.span('chrome'):
+                    return _check_with_browser(site_info)
+
+
+def _check_fast(site_info, session=None):
+    """Plain HTTP check; returns None when the browser tier should decide"""
     import requests
     import urllib3
     urllib3.disable_warnings()
 
     url = site_info['url']
+    http = session or requests
 
     # Step 1: Try fast requests method
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        for attempt in range(3):  # retry 3 times internally
+        response = None
+        redirects = None
+        note = None
+        method = 'fast'
+
+        # Known redirect chain: skip the hops and probe the final target directly
+        cached, fresh = _cached_redirect(url)
+        if cached and fresh:
             try:
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    timeout=20,  # increased from 10 → 20
-                    verify=False
-                )
-                break  # success, exit retry loop
-            except requests.exceptions.Timeout:
-                if attempt == 2:
-                    raise
-                time.sleep(2)  # small wait before retry
-
-        # SUCCESS: 2xx or 3xx (redirects)
-        if 200 <= response.status_code < 400:
-            return {
-                'success': True,
-                'status_code': response.status_code,
-                'url': url,
-                'bu': site_info['bu'],
-                'name': site_info['name'],
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'method': 'fast'
-            }
+                # One attempt only - any error falls back to the full walk below
+                direct = _fetch(http, cached['final_url'], headers, allow_redirects=False, attempts=1)
+            except requests.exceptions.RequestException:
+                direct = None
+            if direct is not None and 200 <= direct.status_code < 300:
+                response = direct
+                redirects = cached['chain']
+                method = 'fast-cached'
+
+        # First check, expired chain, or the cached target stopped answering 2xx:
+        # walk from the listed URL again and compare with what was recorded
+        if response is None:
+            response = _fetch(http, url, headers)
+            if cached:
+                note = _redirect_change(cached, response)
+            redirects = _store_redirect(url, response, note)
+
+        fingerprint = body_fingerprint(response.content) if recorder.active else None
+
+        # SUCCESS: 2xx at the end of the chain
+        if 200 <= response.status_code < 300:
+            return CheckResult(site_info, Status.OK, response.status_code, method=method,
+                               note=note, redirects=redirects, fingerprint=fingerprint)
+
+        # A 3xx left after following redirects has no usable Location
+        if 300 <= response.status_code < 400:
+            return CheckResult(site_info, Status.REDIRECT_BROKEN, response.status_code, method=method,
+                               detail=f'HTTP {response.status_code} without Location',
+                               note=note, redirects=redirects, fingerprint=fingerprint)
 
         # CLIENT ERRORS: 4xx (except some special cases)
         # 403 Forbidden = FAIL (site is blocking us, but we can't access it)
@@ -128,64 +417,43 @@ def check_website(site_info):
         # 405 Method Not Allowed = try GET instead of HEAD, but still fail if persists
 
         if response.status_code in [403, 401, 404, 405, 406, 407, 408, 409, 410, 429]:
-            return {
-                'success': False,
-                'status_code': response.status_code,
-                'url': url,
-                'bu': site_info['bu'],
-                'name': site_info['name'],
-                'error': f'HTTP {response.status_code} - {"Forbidden" if response.status_code == 403 else "Client Error"}',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            return CheckResult(site_info, Status.HTTP_CLIENT_ERROR, response.status_code, method=method,
+                               note=note, redirects=redirects, fingerprint=fingerprint)
 
         # SERVER ERRORS: 5xx (site is down)
         if response.status_code >= 500:
-            return {
-                'success': False,
-                'status_code': response.status_code,
-                'url': url,
-                'bu': site_info['bu'],
-                'name': site_info['name'],
-                'error': f'HTTP {response.status_code} - Server Error',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            return CheckResult(site_info, Status.HTTP_SERVER_ERROR, response.status_code, method=method,
+                               note=note, redirects=redirects, fingerprint=fingerprint)
 
     except requests.exceptions.Timeout:
-        return {
-            'success': False,
-            'status_code': 0,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'error': 'Timeout',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        return CheckResult(site_info, Status.TIMEOUT, method='fast')
+    except requests.exceptions.TooManyRedirects:
+        return CheckResult(site_info, Status.REDIRECT_BROKEN, method='fast', detail='Too many redirects')
     except Exception as e:
         # Continue to Selenium for connection errors, SSL errors, etc.
         pass
 
-    # Step 2: Use Selenium for sites that might need JavaScript rendering
-    # BUT: We should NOT use Selenium for 403 errors - if requests got 403,
-    # Selenium will likely also be blocked or get a challenge page
+    return None
+
 
-    print(f"   Trying Selenium for: {site_info['name']}")
+def _check_with_browser(site_info):
+    """Selenium fallback for sites the fast path could not judge"""
+    url = site_info['url']
 
     try:
-        options = Options()
-        options.add_argument('--headless=new')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
+        sel = _import_selenium()
+        webdriver, Options, Service = sel['webdriver'], sel['Options'], sel['Service']
+        ChromeDriverManager, stealth = sel['ChromeDriverManager'], sel['stealth']
 
         driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=options
+            service=Service(_chromedriver_path(ChromeDriverManager)),
+            options=_browser_options(Options)
         )
 
+        # Drop heavy subresources at the network layer before the page starts loading
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BROWSER_BLOCKED_URLS})
+
         stealth(driver,
                 languages=["en-US", "en"],
                 vendor="Google Inc.",
@@ -194,12 +462,25 @@ def check_website(site_info):
                 renderer="Intel Iris OpenGL Engine",
                 fix_hairline=True)
 
-        driver.set_page_load_timeout(25)
+        driver.set_page_load_timeout(BROWSER_PAGE_LOAD_TIMEOUT)
         driver.get(url)
 
+        # Optional per-site readiness condition (sheet column 'Ready': a CSS selector)
+        ready = site_info.get('ready')
+        is_ready = True
+        if ready:
+            try:
+                sel['WebDriverWait'](driver, BROWSER_READY_TIMEOUT).until(
+                    sel['expected_conditions'].presence_of_element_located((sel['By'].CSS_SELECTOR, ready))
+                )
+            except sel['TimeoutException']:
+                is_ready = False
+
         # Check if we hit a cloudflare/verification page
         page_title = driver.title.lower()
-        page_source = driver.page_source.lower()
+        raw_source = driver.page_source
+        page_source = raw_source.lower()
+        fingerprint = body_fingerprint(raw_source) if recorder.active else None
 
         # Common indicators of being blocked
         blocked_indicators = [
@@ -213,30 +494,19 @@ def check_website(site_info):
 
         if is_blocked:
             driver.quit()
-            return {
-                'success': False,
-                'status_code': 403,
-                'url': url,
-                'bu': site_info['bu'],
-                'name': site_info['name'],
-                'error': 'Blocked by WAF/Cloudflare',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'method': 'selenium-blocked'
-            }
+            return CheckResult(site_info, Status.BLOCKED, 403, method='selenium-blocked',
+                               fingerprint=fingerprint)
+
+        if not is_ready:
+            driver.quit()
+            return CheckResult(site_info, Status.PAGE_NOT_READY, method='selenium', detail=ready[:60],
+                               fingerprint=fingerprint)
 
         title = driver.title
         driver.quit()
 
-        return {
-            'success': True,
-            'status_code': 200,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'method': 'selenium',
-            'title': title[:30]
-        }
+        return CheckResult(site_info, Status.OK, 200, method='selenium', title=title[:30],
+                           fingerprint=fingerprint)
 
     except Exception as e:
         try:
@@ -244,19 +514,200 @@ def check_website(site_info):
         except:
             pass
 
-        return {
-            'success': False,
-            'status_code': 0,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'error': 'Selenium failed',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        return CheckResult(site_info, Status.BROWSER_FAILED, method='selenium')
+
+
+def check_host_group(sites):
+    """Check a small chunk of same-host targets over one shared session"""
+    results = []
+    with requests.Session() as session:
+        for site in sites:
+            if not monitoring_results['is_running']:
+                break
+            try:
+                results.append(check_website(site, session=session))
+            except Exception as e:
+                print("Thread error:", e)
+    return results
+
+
+def _update_redirect_info(failed_entry, result):
+    """Carry a newer redirect chain or change note onto the stored entry. Call with results_lock held."""
+    changed = False
+    if result.note and result.note != failed_entry.note:
+        failed_entry.note = result.note
+        changed = True
+    # Only a fast-path result that got an HTTP answer knows the current chain
+    if (result.status_code and (result.method or '').startswith('fast')
+            and result.redirects != failed_entry.redirects):
+        failed_entry.redirects = result.redirects
+        changed = True
+    return changed
+
+
+def _mark_failed(result):
+    """Add a failed result, or refresh the redirect info of the listed one. Call with results_lock held."""
+    failed_entry = monitoring_results['failed'].get(result.url)
+    if failed_entry is None:
+        monitoring_results['failed'][result.url] = result
+        monitoring_results['failed_version'] += 1
+    elif _update_redirect_info(failed_entry, result):
+        monitoring_results['failed_version'] += 1
+
+
+def _mark_recovered(url):
+    """Drop a URL from the failed list. Call with results_lock held."""
+    if monitoring_results['failed'].pop(url, None) is not None:
+        monitoring_results['failed_version'] += 1
+        return True
+    return False
+
+
+def _mark_retry_failed(failed_entry, result):
+    """Record an unsuccessful retry on the stored entry. Call with results_lock held."""
+    failed_entry.retry_count += 1
+    failed_entry.last_retry = result.timestamp
+    failed_entry.last_error = (result.status, result.status_code, result.detail)
+    _update_redirect_info(failed_entry, result)
+    monitoring_results['failed_version'] += 1
+
+
+def _reset_results():
+    """Forget every result, e.g. when switching between live and replayed probes. Call with results_lock held."""
+    monitoring_results['failed'].clear()
+    monitoring_results['failed_version'] += 1
+    monitoring_results['total'] = 0
+    monitoring_results['checked'] = 0
+    monitoring_results['last_check'] = None
+    monitoring_results['generation'] += 1
+
+
+def _failed_payload():
+    """JSON-ready failed list, reformatted only when it changed. Call with results_lock held."""
+    if _failed_payload_cache['version'] != monitoring_results['failed_version']:
+        _failed_payload_cache['items'] = [f.to_dict() for f in monitoring_results['failed'].values()]
+        _failed_payload_cache['version'] = monitoring_results['failed_version']
+    return _failed_payload_cache['items']
+
+
+def _failed_facets():
+    """Filter counts for the failed list, recomputed only when it changed. Call with results_lock held."""
+    if _failed_facets_cache['version'] != monitoring_results['failed_version']:
+        _failed_facets_cache['facets'] = failure_facets(monitoring_results['failed'].values())
+        _failed_facets_cache['version'] = monitoring_results['failed_version']
+    return _failed_facets_cache['facets']
 
 
 def get_demo_websites():
-    return [{'bu': 'Demo', 'url': 'https://www.google.com', 'name': 'google.com'}]
+    return build_targets([('Demo', 'https://www.google.com')])
+
+
+@contextmanager
+def _traced_lock(lock):
+    """Acquire lock, recording the wait as a 'lock_wait' span when tracing is on"""
+    with tracer.span('lock_wait'):
+        lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _traced_view(name):
+    """Wrap a Flask view in a slow-check trace root"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with tracer.trace(name, path=request.path):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _admin_view(view):
+    """Serve an admin route only to callers presenting ADMIN_TOKEN"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'error': 'Admin API disabled'}), 404
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+            return jsonify({'success': False, 'error': 'Invalid admin token'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _admin_number(data, name, default, low, high, cast=int):
+    """Read a bounded number from an admin request body; ValueError names the bad field"""
+    value = data.get(name, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
+
+
+def _run_cycle(first_cycle):
+    """Load the inventory, sweep every target once and fold results into state"""
+    cycle_started = time.perf_counter()
+    with tracer.span('load_inventory'):
+        websites = replayer.targets() if replayer.active else load_websites_from_excel()
+
+    with _traced_lock(results_lock):
+        generation = monitoring_results['generation']
+        monitoring_results['total'] = len(websites)
+        monitoring_results['checked'] = 0
+
+    print(f"\n🔍 Checking {len(websites)} websites using multithreading...")
+
+    # Queue on the sweep lane, one task per small same-host chunk so those
+    # targets share a keep-alive session; operator retries jump ahead
+    checked = 0
+    with tracer.span('queue_sweep'):
+        futures = [
+            probe_scheduler.submit(LANE_SWEEP, check_host_group, group)
+            for group in group_by_host(websites, HOST_CHUNK_SIZE)
+        ]
+
+    for future in as_completed(futures):
+        if not monitoring_results['is_running']:
+            break
+
+        try:
+            group_results = future.result()
+        except Exception as e:
+            print("Thread error:", e)
+            continue
+
+        with _traced_lock(results_lock):
+            if monitoring_results['generation'] != generation:
+                # Replay was switched on or off mid-cycle: these results belong
+                # to the other data source, drop them and the queued remainder
+                for pending in futures:
+                    pending.cancel()
+                return
+            for result in group_results:
+                checked += 1
+                monitoring_results['checked'] = checked
+                if first_cycle and startup_timing['first_result_seconds'] is None:
+                    startup_timing['first_result_seconds'] = round(time.perf_counter() - cycle_started, 3)
+
+                if not result.success:
+                    _mark_failed(result)
+                else:
+                    # Remove recovered sites from failed list
+                    _mark_recovered(result.url)
+
+    with _traced_lock(results_lock):
+        if monitoring_results['generation'] != generation:
+            return
+        monitoring_results['last_check'] = time.time()
+        if first_cycle:
+            startup_timing['first_cycle_seconds'] = round(time.perf_counter() - cycle_started, 3)
 
 
 def monitor_websites():
@@ -264,64 +715,89 @@ def monitor_websites():
     global monitoring_results
 
     monitoring_results['is_running'] = True
+    first_cycle = startup_timing['first_cycle_seconds'] is None
 
     while monitoring_results['is_running']:
-        websites = load_websites_from_excel()
+        cycle_started = time.perf_counter()
+        generation = monitoring_results['generation']
+        # Sampling profiler runs only for cycles armed via /api/admin/profile
+        profiler.on_cycle_start()
+        try:
+            with tracer.trace('cycle'):
+                _run_cycle(first_cycle)
+        finally:
+            profiler.on_cycle_end()
+        first_cycle = False
 
-        with results_lock:
-            monitoring_results['total'] = len(websites)
-            monitoring_results['checked'] = 0
+        print(f"✅ Cycle done. Failed: {len(monitoring_results['failed'])}")
 
-        print(f"\n🔍 Checking {len(websites)} websites using multithreading...")
+        # Wait CHECK_INTERVAL seconds before next cycle; when replaying, start the
+        # next cycle at the recorded (scaled) gap after this one started. A switch
+        # between live and replay starts a fresh cycle right away.
+        if monitoring_results['generation'] != generation:
+            sleep_seconds = 0
+        elif replayer.active:
+            sleep_seconds = replayer.next_cycle_gap(CHECK_INTERVAL) - (time.perf_counter() - cycle_started)
+        else:
+            sleep_seconds = CHECK_INTERVAL
+        while (sleep_seconds > 0 and monitoring_results['is_running'] and
+               monitoring_results['generation'] == generation):
+            time.sleep(min(1, sleep_seconds))
+            sleep_seconds -= 1
 
-        # Use thread pool for parallel website checks
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {
-                executor.submit(check_website, site): site
-                for site in websites
-            }
+    print("🛑 Monitoring stopped")
 
-            for i, future in enumerate(as_completed(futures), start=1):
-                if not monitoring_results['is_running']:
-                    break
-
-                try:
-                    result = future.result()
-                except Exception as e:
-                    print("Thread error:", e)
-                    continue
-
-                with results_lock:
-                    monitoring_results['checked'] = i
-
-                    if not result['success']:
-                        existing = next(
-                            (f for f in monitoring_results['failed']
-                             if f['url'] == result['url']),
-                            None
-                        )
-                        if not existing:
-                            result['retry_count'] = 0
-                            monitoring_results['failed'].append(result)
-                    else:
-                        # Remove recovered sites from failed list
-                        monitoring_results['failed'] = [
-                            f for f in monitoring_results['failed']
-                            if f['url'] != result['url']
-                        ]
 
-        with results_lock:
-            monitoring_results['last_check'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+def _acquire_leader_lock():
+    """Take the cross-process monitor lock so only one worker runs the checker"""
+    global _leader_lock_handle
 
-        print(f"✅ Cycle done. Failed: {len(monitoring_results['failed'])}")
+    if _leader_lock_handle is not None:
+        return True
 
-        # Wait CHECK_INTERVAL seconds before next cycle
-        sleep_seconds = CHECK_INTERVAL
-        while sleep_seconds > 0 and monitoring_results['is_running']:
-            time.sleep(1)
-            sleep_seconds -= 1
+    try:
+        import fcntl
+    except ImportError:
+        # No flock on this platform (local Windows runs) - single process anyway
+        return True
 
-    print("🛑 Monitoring stopped")
+    handle = open(MONITOR_LOCK_FILE, 'a+')
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _leader_lock_handle = handle
+    return True
+
+
+def bootstrap_monitor():
+    """Start the monitor thread once per deployment.
+
+    Called from the gunicorn post_worker_init hook (gunicorn.conf.py), from
+    __main__ and from /api/start. Only the worker holding the leader lock
+    starts the checker; the others just serve the dashboard.
+    """
+    with _bootstrap_lock:
+        if monitoring_results['is_running']:
+            return False
+
+        if not _acquire_leader_lock():
+            print(f"⏸  Monitor already running in another worker (pid {os.getpid()})")
+            return False
+
+        startup_timing['monitor_leader'] = True
+        startup_timing['monitor_started_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        monitoring_results['is_running'] = True
+        t = threading.Thread(target=monitor_websites, daemon=True)
+        t.start()
+        print(f"🚀 Started monitoring (pid {os.getpid()})")
+        return True
 
 
 @app.route('/')
@@ -331,13 +807,125 @@ def index():
 
 @app.route('/api/start', methods=['POST'])
 def start_monitoring():
-    if not monitoring_results['is_running']:
-        t = threading.Thread(target=monitor_websites, daemon=True)
-        t.start()
+    # Same leader lock as the auto-start, so a POST that lands on a
+    # non-leader worker cannot start a second checker
+    if bootstrap_monitor():
         return jsonify({'status': 'started'})
     return jsonify({'status': 'already_running'})
 
 
+@app.route('/health')
+def health():
+    """Liveness probe with import and startup timing"""
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'is_running': monitoring_results['is_running'],
+        'timing': dict(startup_timing)
+    })
+
+
+@app.route('/api/scheduler')
+def scheduler_stats():
+    """Queue depth and latency per priority lane"""
+    return jsonify(probe_scheduler.stats())
+
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+@_admin_view
+def admin_profile():
+    """Arm the sampling profiler for the next N cycles (POST), stop it (DELETE) or read status"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            cycles = _admin_number(data, 'cycles', 1, 1, 100)
+            interval_ms = _admin_number(data, 'interval_ms', 10, 1, 1000)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        profiler.arm(cycles, interval_ms)
+    elif request.method == 'DELETE':
+        profiler.disarm()
+    return jsonify(profiler.status())
+
+
+@app.route('/api/admin/profile.folded')
+@_admin_view
+def admin_profile_folded():
+    """Collapsed stacks for flamegraph.pl / speedscope / inferno"""
+    return Response(profiler.folded(), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=monitor-profile.folded'})
+
+
+@app.route('/api/admin/trace', methods=['GET', 'POST', 'DELETE'])
+@_admin_view
+def admin_trace():
+    """Turn slow-check tracing on/off (POST {enabled, threshold_ms}), clear (DELETE) or list traces"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        threshold_ms = None
+        if data.get('threshold_ms') is not None:
+            try:
+                threshold_ms = _admin_number(data, 'threshold_ms', None, 0, 3_600_000, cast=float)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        tracer.configure(bool(data.get('enabled', True)), threshold_ms)
+    elif request.method == 'DELETE':
+        tracer.clear()
+    return jsonify({**tracer.status(), 'traces': tracer.traces()})
+
+
+@app.route('/api/admin/trace.json')
+@_admin_view
+def admin_trace_json():
+    """Captured traces as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+    return Response(tracer.chrome_trace(), mimetype='application/json',
+                    headers={'Content-Disposition': 'attachment; filename=monitor-trace.json'})
+
+
+@app.route('/api/admin/record', methods=['GET', 'POST', 'DELETE'])
+@_admin_view
+def admin_record():
+    """Start recording probes to PROBE_RECORD_FILE (POST), stop (DELETE) or read status"""
+    if request.method == 'POST':
+        if not PROBE_RECORD_FILE:
+            return jsonify({'success': False, 'error': 'PROBE_RECORD_FILE is not set'}), 400
+        try:
+            recorder.start(PROBE_RECORD_FILE)
+        except OSError as e:
+            return jsonify({'success': False, 'error': f'Cannot open recording: {e.strerror}'}), 500
+    elif request.method == 'DELETE':
+        recorder.stop()
+    return jsonify(recorder.status())
+
+
+@app.route('/api/admin/replay', methods=['GET', 'POST', 'DELETE'])
+@_admin_view
+def admin_replay():
+    """Replay PROBE_REPLAY_FILE (POST {speed, loop}), go back to live probing (DELETE) or read status
+
+    Switching either way clears the failed list and counters, so the dashboard
+    never mixes live and replayed results.
+    """
+    if request.method == 'POST':
+        if not PROBE_REPLAY_FILE:
+            return jsonify({'success': False, 'error': 'PROBE_REPLAY_FILE is not set'}), 400
+        data = request.get_json(silent=True) or {}
+        try:
+            speed = _admin_number(data, 'speed', PROBE_REPLAY_SPEED, 0.001, 10_000, cast=float)
+            replayer.load(PROBE_REPLAY_FILE, speed, bool(data.get('loop', PROBE_REPLAY_LOOP)))
+        except OSError as e:
+            return jsonify({'success': False, 'error': f'Cannot read recording: {e.strerror}'}), 400
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        with results_lock:
+            _reset_results()
+    elif request.method == 'DELETE' and replayer.active:
+        replayer.stop()
+        with results_lock:
+            _reset_results()
+    return jsonify(replayer.status())
+
+
 @app.route('/api/stop', methods=['POST'])
 def stop_monitoring():
     monitoring_results['is_running'] = False
@@ -351,13 +939,75 @@ def status():
         return jsonify({
             'total': monitoring_results['total'],
             'checked': monitoring_results['checked'],
-            'failed': [f.copy() for f in monitoring_results['failed']],
-            'last_check': monitoring_results['last_check'],
+            'failed': _failed_payload() if request.args.get('include_failed') != '0' else [],
+            'failed_count': len(monitoring_results['failed']),
+            'failed_version': monitoring_results['failed_version'],
+            'last_check': format_ts(monitoring_results['last_check']),
             'is_running': monitoring_results['is_running']
         })
 
 
+@app.route('/api/failures')
+def failures():
+    """One page of the failed list, filtered by BU, error class and method
+
+    Query: page, per_page, sort, order, bu, error_class, method. Pass the last
+    seen since_version to get a tiny 'unchanged' reply when nothing moved.
+    """
+    query = parse_failure_query(request.args)
+    since_version = query.pop('since_version')
+
+    with results_lock:
+        version = monitoring_results['failed_version']
+        if since_version == version:
+            return jsonify({'unchanged': True, 'version': version})
+        records = list(monitoring_results['failed'].values())
+        facets = _failed_facets()
+
+    page_records, total = query_failures(records, **query)
+
+    return jsonify({
+        'items': [r.to_dict() for r in page_records],
+        'total': total,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'pages': max(1, -(-total // query['per_page'])),
+        'failed_count': len(records),
+        'facets': facets,
+        'version': version
+    })
+
+
+@app.route('/api/redirects')
+def redirects():
+    """Redirect chain and last change for every URL that redirects (or used to)
+
+    Pass changed=1 to list only URLs whose chain has changed, newest first.
+    """
+    with redirect_lock:
+        entries = [(url, dict(status)) for url, status in redirect_status.items()]
+
+    if request.args.get('changed') == '1':
+        entries = [(url, status) for url, status in entries if status['note']]
+    entries.sort(key=lambda item: item[1]['changed_at'] or 0, reverse=True)
+
+    items = []
+    for url, status in entries:
+        item = {
+            'url': url,
+            'final_url': status['final_url'],
+            'redirects': [{'status_code': code, 'url': hop} for code, hop in status['chain'] or ()],
+            'walked_at': format_ts(status['walked_at']),
+        }
+        if status['note']:
+            item['note'] = status['note']
+            item['changed_at'] = format_ts(status['changed_at'])
+        items.append(item)
+    return jsonify({'items': items, 'changed': sum(1 for _, status in entries if status['note'])})
+
+
 @app.route('/api/retry', methods=['POST'])
+@_traced_view('retry')
 def retry_website():
     """Retry single website"""
     global monitoring_results
@@ -370,30 +1020,26 @@ def retry_website():
     if not url:
         return jsonify({'success': False, 'error': 'No URL provided'}), 400
 
-    with results_lock:
-        site_index = None
-        site_info = None
+    with _traced_lock(results_lock):
+        failed_entry = monitoring_results['failed'].get(url)
 
-        for i, site in enumerate(monitoring_results['failed']):
-            if site['url'] == url:
-                site_index = i
-                site_info = site
-                break
-
-        if site_index is None:
+        if failed_entry is None:
             return jsonify({'success': False, 'error': 'Site not found'}), 404
 
-        retry_count = site_info.get('retry_count', 0)
+        site_info = failed_entry.site_info()
+        retry_count = failed_entry.retry_count
 
-    # Perform retry outside lock
+    # Perform retry outside lock, on the interactive lane so it is served
+    # ahead of the sweep with its own reserved workers and browser slot
     print(f"🔄 Retrying: {url} (attempt {retry_count + 1})")
-    result = check_website(site_info)
+    with tracer.span('wait_for_probe'):
+        result = probe_scheduler.submit(LANE_INTERACTIVE, check_website, site_info).result()
 
-    with results_lock:
+    with _traced_lock(results_lock):
         monitoring_results['retry_in_progress'] = False
 
-        if result['success']:
-            monitoring_results['failed'].pop(site_index)
+        if result.success:
+            _mark_recovered(url)
             print(f"   ✅ Success! Removed from failed list.")
             return jsonify({
                 'success': True,
@@ -401,53 +1047,58 @@ def retry_website():
                 'failed_count': len(monitoring_results['failed'])
             })
         else:
-            site_info['retry_count'] = retry_count + 1
-            site_info['last_retry'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            site_info['last_error'] = result.get('error', 'Unknown')
-            print(f"   ❌ Failed. Count: {site_info['retry_count']}")
+            _mark_retry_failed(failed_entry, result)
+            print(f"   ❌ Failed. Count: {failed_entry.retry_count}")
             return jsonify({
                 'success': False,
-                'error': result.get('error', 'Check failed'),
-                'retry_count': site_info['retry_count'],
+                'error': result.error or 'Check failed',
+                'retry_count': failed_entry.retry_count,
             })
 
 
 @app.route('/api/retry-all', methods=['POST'])
+@_traced_view('retry_all')
 def retry_all_failed():
     """Retry all failed websites"""
     global monitoring_results
 
-    with results_lock:
-        failed_sites = [f.copy() for f in monitoring_results['failed']]
+    with _traced_lock(results_lock):
+        failed_sites = [f.site_info() for f in monitoring_results['failed'].values()]
         monitoring_results['retry_in_progress'] = True
 
     if not failed_sites:
-        with results_lock:
+        with _traced_lock(results_lock):
             monitoring_results['retry_in_progress'] = False
         return jsonify({'success': True, 'message': 'No failed sites', 'results': []})
 
     results = []
 
-    for site in failed_sites:
-        retry_count = site.get('retry_count', 0)
-
-        result = check_website(site)
+    # Re-checks go ahead of the sweep but behind single interactive retries
+    futures = {
+        probe_scheduler.submit(LANE_RECHECK, check_website, site): site
+        for site in failed_sites
+    }
 
-        with results_lock:
-            if result['success']:
-                monitoring_results['failed'] = [f for f in monitoring_results['failed'] if f['url'] != site['url']]
+    for future in as_completed(futures):
+        site = futures[future]
+        try:
+            with tracer.span('wait_for_probe'):
+                result = future.result()
+        except Exception as e:
+            print("Thread error:", e)
+            continue
+
+        with _traced_lock(results_lock):
+            if result.success:
+                _mark_recovered(site['url'])
                 results.append({'url': site['url'], 'success': True})
             else:
-                for f in monitoring_results['failed']:
-                    if f['url'] == site['url']:
-                        f['retry_count'] = retry_count + 1
-                        f['last_retry'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        break
+                failed_entry = monitoring_results['failed'].get(site['url'])
+                if failed_entry is not None:
+                    _mark_retry_failed(failed_entry, result)
                 results.append({'url': site['url'], 'success': False})
 
-        time.sleep(0.5)
-
-    with results_lock:
+    with _traced_lock(results_lock):
         monitoring_results['retry_in_progress'] = False
 
     successful = sum(1 for r in results if r.get('success'))
@@ -461,16 +1112,24 @@ def retry_all_failed():
     })
 
 
+if PROBE_REPLAY_FILE:
+    replayer.load(PROBE_REPLAY_FILE, PROBE_REPLAY_SPEED, PROBE_REPLAY_LOOP)
+    print(f"⏪ Replaying probes from {PROBE_REPLAY_FILE} at {PROBE_REPLAY_SPEED}x")
+elif PROBE_RECORD_FILE:
+    recorder.start(PROBE_RECORD_FILE)
+    print(f"⏺  Recording probes to {PROBE_RECORD_FILE}")
+
+startup_timing['app_import_seconds'] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Adani Website Health Monitor")
     print("=" * 60)
 
     # Auto-start monitoring
-    if not monitoring_results['is_running']:
-        t = threading.Thread(target=monitor_websites, daemon=True)
-        t.start()
-        print("🚀 Auto-started monitoring")
+    if AUTO_START_MONITOR:
+        bootstrap_monitor()
 
-    # Run with threading enabled
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    # Run with threading enabled (no reloader, it would start a second monitor)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True, use_reloader=False)
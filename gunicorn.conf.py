@@ -0,0 +1,10 @@
+# Gunicorn picks this file up automatically from the working directory.
+# It starts the website checker as soon as a worker is ready instead of
+# waiting for someone to POST /api/start.
+
+
+def post_worker_init(worker):
+    import app
+
+    if app.AUTO_START_MONITOR:
+        app.bootstrap_monitor()
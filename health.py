@@ -6,6 +6,9 @@ import os
 from flask import Flask, render_template, jsonify, request
 from datetime import datetime
 import urllib3
+from inventory import build_targets
+from results import (CheckResult, Status, failure_facets, format_ts, parse_failure_query,
+                     query_failures)
 
 urllib3.disable_warnings()
 app = Flask(__name__)
@@ -15,14 +18,19 @@ CHECK_INTERVAL = 15 * 60  # 15 minutes
 monitoring_results = {
     'total': 0,
     'checked': 0,
-    'failed': [],
-    'last_check': None,
+    'failed': {},  # url -> CheckResult, insertion ordered
+    'failed_version': 0,  # bumped on every change to 'failed'
+    'last_check': None,  # epoch seconds
     'is_running': False,
     'retry_in_progress': False
 }
 
 results_lock = threading.Lock()
 
+# Formatted copy of the failed list, rebuilt only when failed_version moves
+_failed_payload_cache = {'version': -1, 'items': []}
+_failed_facets_cache = {'version': -1, 'facets': None}
+
 
 def load_websites_from_excel():
     """Load websites from Excel"""
@@ -46,7 +54,7 @@ def load_websites_from_excel():
             return get_demo_websites()
 
         df = pd.read_excel(path)
-        websites = []
+        entries = []
 
         for _, row in df.iterrows():
             bu = str(row.get('BU', '')).strip()
@@ -66,11 +74,10 @@ def load_websites_from_excel():
                     url = 'https://' + url
                 url = url.replace(' ', '').rstrip('/')
 
-                websites.append({
-                    'bu': bu,
-                    'url': url,
-                    'name': url.replace('https://', '').replace('http://', '').replace('www.', '')
-                })
+                entries.append((bu, url))
+
+        # One probe target per canonical URL, owned by every BU that lists it
+        websites = build_targets(entries)
 
         print(f"✓ Loaded {len(websites)} websites")
         return websites
@@ -107,71 +114,43 @@ def check_website(site_info):
                 with context.wrap_socket(sock, server_hostname=hostname) as ssock:
                     cert = ssock.getpeercert()
                     sock.close()
-                    return {
-                        'success': True,
-                        'status_code': 200,
-                        'url': url,
-                        'bu': site_info['bu'],
-                        'name': site_info['name'],
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'method': 'socket+ssl',
-                        'note': 'Port open, SSL valid'
-                    }
+                    return CheckResult(site_info, Status.OK, 200, method='socket+ssl',
+                                       note='Port open, SSL valid')
             except ssl.SSLError as e:
                 sock.close()
-                return {
-                    'success': False,
-                    'status_code': 0,
-                    'url': url,
-                    'bu': site_info['bu'],
-                    'name': site_info['name'],
-                    'error': f'SSL Error: {str(e)[:30]}',
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'method': 'socket'
-                }
+                return CheckResult(site_info, Status.SSL_ERROR, method='socket', detail=str(e)[:30])
 
         sock.close()
-        return {
-            'success': True,
-            'status_code': 200,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'method': 'socket',
-            'note': 'Port open (HTTP)'
-        }
+        return CheckResult(site_info, Status.OK, 200, method='socket', note='Port open (HTTP)')
 
     except socket.timeout:
-        return {
-            'success': False,
-            'status_code': 0,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'error': 'Connection timeout',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'method': 'socket'
-        }
+        return CheckResult(site_info, Status.CONNECTION_TIMEOUT, method='socket')
     except Exception as e:
         # Connection refused or other error = site down or blocked
-        return {
-            'success': False,
-            'status_code': 0,
-            'url': url,
-            'bu': site_info['bu'],
-            'name': site_info['name'],
-            'error': f'Connection failed: {str(e)[:30]}',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'method': 'socket'
-        }
+        return CheckResult(site_info, Status.CONNECTION_FAILED, method='socket', detail=str(e)[:30])
+
+
+def _failed_payload():
+    """JSON-ready failed list, reformatted only when it changed. Call with results_lock held."""
+    if _failed_payload_cache['version'] != monitoring_results['failed_version']:
+        _failed_payload_cache['items'] = [f.to_dict() for f in monitoring_results['failed'].values()]
+        _failed_payload_cache['version'] = monitoring_results['failed_version']
+    return _failed_payload_cache['items']
+
+
+def _failed_facets():
+    """Filter counts for the failed list, recomputed only when it changed. Call with results_lock held."""
+    if _failed_facets_cache['version'] != monitoring_results['failed_version']:
+        _failed_facets_cache['facets'] = failure_facets(monitoring_results['failed'].values())
+        _failed_facets_cache['version'] = monitoring_results['failed_version']
+    return _failed_facets_cache['facets']
 
 
 def get_demo_websites():
-    return [
-        {'bu': 'Demo', 'url': 'https://www.google.com', 'name': 'google.com'},
-        {'bu': 'Demo', 'url': 'https://www.github.com', 'name': 'github.com'}
-    ]
+    return build_targets([
+        ('Demo', 'https://www.google.com'),
+        ('Demo', 'https://www.github.com')
+    ])
 
 
 def monitor_websites():
@@ -185,7 +164,8 @@ def monitor_websites():
         with results_lock:
             monitoring_results['total'] = len(websites)
             monitoring_results['checked'] = 0
-            monitoring_results['failed'] = []
+            monitoring_results['failed'] = {}
+            monitoring_results['failed_version'] += 1
 
         print(f"\n{'=' * 60}")
         print(f"🔍 CYCLE STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -202,19 +182,19 @@ def monitor_websites():
 
             with results_lock:
                 monitoring_results['checked'] = i
-                if not result['success']:
-                    result['retry_count'] = 0
-                    monitoring_results['failed'].append(result)
-                    print(f"❌ FAILED ({result['error'] or result['status_code']})")
+                if not result.success:
+                    monitoring_results['failed'][result.url] = result
+                    monitoring_results['failed_version'] += 1
+                    print(f"❌ FAILED ({result.error or result.status_code})")
                 else:
-                    monitoring_results['failed'] = [f for f in monitoring_results['failed'] if
-                                                    f['url'] != result['url']]
-                    print(f"✅ OK ({result['status_code']})")
+                    if monitoring_results['failed'].pop(result.url, None) is not None:
+                        monitoring_results['failed_version'] += 1
+                    print(f"✅ OK ({result.status_code})")
 
             time.sleep(0.5)
 
         with results_lock:
-            monitoring_results['last_check'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            monitoring_results['last_check'] = time.time()
 
         print(f"\n✅ CYCLE COMPLETE")
         print(f"   Failed: {len(monitoring_results['failed'])} sites")
@@ -256,12 +236,45 @@ def status():
         return jsonify({
             'total': monitoring_results['total'],
             'checked': monitoring_results['checked'],
-            'failed': [f.copy() for f in monitoring_results['failed']],
-            'last_check': monitoring_results['last_check'],
+            'failed': _failed_payload() if request.args.get('include_failed') != '0' else [],
+            'failed_count': len(monitoring_results['failed']),
+            'failed_version': monitoring_results['failed_version'],
+            'last_check': format_ts(monitoring_results['last_check']),
             'is_running': monitoring_results['is_running']
         })
 
 
+@app.route('/api/failures')
+def failures():
+    """One page of the failed list, filtered by BU, error class and method
+
+    Query: page, per_page, sort, order, bu, error_class, method. Pass the last
+    seen since_version to get a tiny 'unchanged' reply when nothing moved.
+    """
+    query = parse_failure_query(request.args)
+    since_version = query.pop('since_version')
+
+    with results_lock:
+        version = monitoring_results['failed_version']
+        if since_version == version:
+            return jsonify({'unchanged': True, 'version': version})
+        records = list(monitoring_results['failed'].values())
+        facets = _failed_facets()
+
+    page_records, total = query_failures(records, **query)
+
+    return jsonify({
+        'items': [r.to_dict() for r in page_records],
+        'total': total,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'pages': max(1, -(-total // query['per_page'])),
+        'failed_count': len(records),
+        'facets': facets,
+        'version': version
+    })
+
+
 @app.route('/api/retry', methods=['POST'])
 def retry_website():
     global monitoring_results
@@ -273,39 +286,34 @@ def retry_website():
     url = data['url']
 
     with results_lock:
-        site_index = None
-        site_info = None
-
-        for i, site in enumerate(monitoring_results['failed']):
-            if site['url'] == url:
-                site_index = i
-                site_info = site
-                break
+        failed_entry = monitoring_results['failed'].get(url)
 
-        if site_index is None:
+        if failed_entry is None:
             return jsonify({'success': False, 'error': 'Site not in failed list'}), 404
 
-        retry_count = site_info.get('retry_count', 0)
+        retry_count = failed_entry.retry_count
         if retry_count >= 3:
             return jsonify({'success': False, 'error': 'Max retries reached', 'retry_count': retry_count}), 429
 
-    result = check_website(site_info)
+    result = check_website(failed_entry.site_info())
 
     with results_lock:
-        if result['success']:
-            monitoring_results['failed'].pop(site_index)
+        if result.success:
+            if monitoring_results['failed'].pop(url, None) is not None:
+                monitoring_results['failed_version'] += 1
             return jsonify({
                 'success': True,
                 'message': 'Website is now accessible',
                 'failed_count': len(monitoring_results['failed'])
             })
         else:
-            site_info['retry_count'] = retry_count + 1
-            site_info['last_retry'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            failed_entry.retry_count = retry_count + 1
+            failed_entry.last_retry = result.timestamp
+            monitoring_results['failed_version'] += 1
             return jsonify({
                 'success': False,
-                'error': result.get('error', 'Check failed'),
-                'retry_count': site_info['retry_count']
+                'error': result.error or 'Check failed',
+                'retry_count': failed_entry.retry_count
             })
 
 
@@ -0,0 +1,104 @@
+from urllib.parse import urlsplit
+
+from results import intern_str
+
+
+def _idna_host(host):
+    """Lowercase host in its ASCII (IDNA) form so unicode and punycode spellings match"""
+    host = host.strip().rstrip('.').lower()
+    try:
+        return host.encode('idna').decode('ascii')
+    except UnicodeError:
+        return host
+
+
+def canonical_key(url):
+    """Canonical identity of a URL: (scheme, host without www., path)
+
+    'https://www.example.com/' and 'https://example.com' map to the same key,
+    so a site listed twice is only probed once per cycle.
+    """
+    parts = urlsplit(url)
+    host = _idna_host(parts.hostname or '')
+    if host.startswith('www.'):
+        host = host[4:]
+
+    default_port = {'http': 80, 'https': 443}.get(parts.scheme.lower())
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != default_port:
+        host = f'{host}:{port}'
+
+    path = parts.path.rstrip('/')
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    return parts.scheme.lower(), host, path
+
+
+def site_name(url):
+    """Display name: host without www. plus path, as written in the sheet"""
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host + parts.path.rstrip('/')
+
+
+def site_host(url):
+    """Connection host used to group targets onto shared sessions"""
+    parts = urlsplit(url)
+    return intern_str(f'{parts.scheme.lower()}://{_idna_host(parts.hostname or "")}')
+
+
+def build_targets(entries):
+    """Merge raw (bu, url[, ready]) rows into one probe target per canonical URL.
+
+    The first listed spelling of a URL is the one probed; every BU that lists
+    it is kept in 'bus' so the result is reported against all of them. The
+    optional ready value is a CSS selector the browser tier waits for.
+    """
+    targets = {}
+    for bu, url, *extra in entries:
+        ready = extra[0] if extra else None
+        key = canonical_key(url)
+        target = targets.get(key)
+        if target is None:
+            targets[key] = {
+                'url': url,
+                'bus': [intern_str(bu)],
+                'name': intern_str(site_name(url)),
+                'host': site_host(url),
+            }
+            if ready:
+                targets[key]['ready'] = ready
+        else:
+            if ready and 'ready' not in target:
+                target['ready'] = ready
+            if bu not in target['bus']:
+                target['bus'].append(intern_str(bu))
+
+    websites = []
+    for target in targets.values():
+        target['bus'] = tuple(target['bus'])
+        target['bu'] = intern_str(', '.join(target['bus']))
+        websites.append(target)
+    return websites
+
+
+def group_by_host(websites, chunk_size=4):
+    """Group targets by scheme+host, in chunks of at most chunk_size.
+
+    Each chunk shares one keep-alive session. Chunking keeps a domain that
+    is listed with dozens of paths from turning into one long serial job.
+    """
+    groups = {}
+    for site in websites:
+        groups.setdefault(site.get('host') or site_host(site['url']), []).append(site)
+
+    chunks = []
+    for sites in groups.values():
+        for start in range(0, len(sites), chunk_size):
+            chunks.append(sites[start:start + chunk_size])
+    return chunks
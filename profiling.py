@@ -0,0 +1,305 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NOOP = nullcontext()
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for all threads, armed for the next N monitor cycles.
+
+    Stacks are aggregated in collapsed form ('frame;frame;frame count'), which
+    flamegraph.pl, speedscope and inferno read directly. Nothing runs while it
+    is not armed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = {}
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.cycles_remaining = 0
+        self.active = False
+        self.started_at = None
+        self.finished_at = None
+
+    def arm(self, cycles, interval_ms=10):
+        """Profile the next `cycles` monitor cycles; clears the previous profile"""
+        with self._lock:
+            self._stacks = {}
+            self._samples = 0
+            self.cycles_remaining = max(1, cycles)
+            self.interval = max(1, interval_ms) / 1000
+            self.started_at = None
+            self.finished_at = None
+
+    def disarm(self):
+        with self._lock:
+            self.cycles_remaining = 0
+        self._stop_sampler()
+
+    def on_cycle_start(self):
+        if self.cycles_remaining and not self.active:
+            self._start_sampler()
+
+    def on_cycle_end(self):
+        if not self.active:
+            return
+        with self._lock:
+            self.cycles_remaining -= 1
+            done = self.cycles_remaining <= 0
+        if done:
+            self._stop_sampler()
+
+    def _start_sampler(self):
+        self._stop.clear()
+        self.active = True
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='profiler')
+        self._thread.start()
+
+    def _stop_sampler(self):
+        if not self.active:
+            return
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.active = False
+        self.finished_at = time.time()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    key = ';'.join(reversed(stack))
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                self._samples += 1
+
+    def folded(self):
+        """Collapsed stacks, one 'stack count' line each"""
+        with self._lock:
+            return '\n'.join(f'{stack} {count}' for stack, count in
+                             sorted(self._stacks.items(), key=lambda item: -item[1])) + '\n'
+
+    def status(self):
+        with self._lock:
+            return {
+                'active': self.active,
+                'cycles_remaining': self.cycles_remaining,
+                'interval_ms': round(self.interval * 1000, 1),
+                'samples': self._samples,
+                'unique_stacks': len(self._stacks),
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class _Trace:
+    __slots__ = ('name', 'args', 'start', 'thread_id', 'thread_name', 'spans')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.spans = []  # (name, start, duration, thread_id)
+
+
+class SlowCheckTracer:
+    """Stage spans for checks, cycles and retries; keeps only traces over a threshold.
+
+    When disabled, trace() and span() return a shared no-op context, so the
+    cost in the hot path is one attribute read. A trace follows its work onto
+    scheduler workers (see attach()), so spans carry the thread they ran on.
+    """
+
+    MAX_SPANS = 10000
+
+    def __init__(self, keep=200):
+        self.enabled = False
+        self.threshold = 5.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._traces = deque(maxlen=keep)
+        self._epoch = time.perf_counter()
+        self._epoch_wall = time.time()
+
+    def configure(self, enabled, threshold_ms=None):
+        if threshold_ms is not None:
+            self.threshold = max(0, threshold_ms) / 1000
+        self.enabled = enabled
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def trace(self, name, **args):
+        """Root of a trace (one check, one cycle, one retry request).
+
+        Inside an existing trace (a check run for a retry or a cycle) this is
+        just a span of that trace.
+        """
+        if not self.enabled:
+            return _NOOP
+        if getattr(self._local, 'trace', None) is not None:
+            return _SpanContext(self, name)
+        return _TraceContext(self, name, args)
+
+    def current(self):
+        """Trace open on this thread, to hand to the thread that continues the work"""
+        if not self.enabled:
+            return None
+        return getattr(self._local, 'trace', None)
+
+    def attach(self, trace):
+        """Make another thread's trace current here, so spans land in it"""
+        if trace is None:
+            return _NOOP
+        return _AttachContext(self, trace)
+
+    def add_span(self, trace, name, start, duration):
+        """Record a span measured elsewhere (e.g. queue wait) on this thread"""
+        if trace is not None:
+            self._append_span(trace, name, start, duration)
+
+    def span(self, name):
+        """Stage inside the current trace"""
+        if not self.enabled or getattr(self._local, 'trace', None) is None:
+            return _NOOP
+        return _SpanContext(self, name)
+
+    def _append_span(self, trace, name, start, duration):
+        # Workers append to the same trace concurrently
+        with self._lock:
+            if len(trace.spans) < self.MAX_SPANS:
+                trace.spans.append((name, start, duration, threading.get_ident()))
+
+    def _finish(self, trace):
+        duration = time.perf_counter() - trace.start
+        if duration >= self.threshold:
+            with self._lock:
+                self._traces.append((trace, duration))
+
+    def traces(self):
+        """Captured traces as plain dicts, slowest first"""
+        with self._lock:
+            captured = list(self._traces)
+        out = []
+        for trace, duration in sorted(captured, key=lambda item: -item[1]):
+            out.append({
+                'name': trace.name,
+                'args': trace.args,
+                'started_at': self._epoch_wall + (trace.start - self._epoch),
+                'duration_ms': round(duration * 1000, 1),
+                'thread_id': trace.thread_id,
+                'thread_name': trace.thread_name,
+                'spans': [{
+                    'name': name,
+                    'offset_ms': round((start - trace.start) * 1000, 1),
+                    'duration_ms': round(span_duration * 1000, 1),
+                    'thread_id': thread_id,
+                } for name, start, span_duration, thread_id in trace.spans],
+            })
+        return out
+
+    def chrome_trace(self):
+        """Traces in Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope)"""
+        with self._lock:
+            captured = list(self._traces)
+        events = []
+        for trace, duration in captured:
+            events.append({
+                'name': trace.name, 'cat': 'trace', 'ph': 'X', 'pid': os.getpid(),
+                'tid': trace.thread_id, 'ts': round((trace.start - self._epoch) * 1e6),
+                'dur': round(duration * 1e6), 'args': trace.args,
+            })
+            for name, start, span_duration, thread_id in trace.spans:
+                events.append({
+                    'name': name, 'cat': 'span', 'ph': 'X', 'pid': os.getpid(),
+                    'tid': thread_id, 'ts': round((start - self._epoch) * 1e6),
+                    'dur': round(span_duration * 1e6),
+                })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def status(self):
+        with self._lock:
+            captured = len(self._traces)
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': round(self.threshold * 1000, 1),
+            'captured': captured,
+        }
+
+
+class _TraceContext:
+    __slots__ = ('tracer', 'trace')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.trace = _Trace(name, args)
+
+    def __enter__(self):
+        self.tracer._local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        self.tracer._local.trace = None
+        self.tracer._finish(self.trace)
+        return False
+
+
+class _AttachContext:
+    __slots__ = ('tracer', 'trace', 'previous')
+
+    def __init__(self, tracer, trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = getattr(self.tracer._local, 'trace', None)
+        self.tracer._local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        self.tracer._local.trace = self.previous
+        return False
+
+
+class _SpanContext:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        trace = getattr(self.tracer._local, 'trace', None)
+        if trace is not None:
+            self.tracer._append_span(trace, self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+profiler = SamplingProfiler()
+tracer = SlowCheckTracer()
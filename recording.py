@@ -0,0 +1,236 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+
+from inventory import build_targets
+from results import CheckResult, Status
+from scheduler import LANE_SWEEP, current_lane
+
+
+def body_fingerprint(body):
+    """Short stable hash of a response body (first 64 KB) to spot content changes"""
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8', 'replace')
+    return hashlib.blake2b(body[:65536], digest_size=8).hexdigest()
+
+
+class ProbeRecorder:
+    """Streams one JSON line per probe (target, lane, timing, outcome, fingerprint, method)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self.path = None
+        self.records = 0
+
+    @property
+    def active(self):
+        return self._file is not None
+
+    def start(self, path):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            # Line buffered append: every probe is on disk as soon as it finishes
+            self._file = open(path, 'a', buffering=1, encoding='utf-8')
+            self.path = path
+            self.records = 0
+
+    def stop(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+
+    def record(self, site_info, result, started_at, duration):
+        line = json.dumps({
+            'ts': round(started_at, 3),
+            'duration_ms': round(duration * 1000, 1),
+            'lane': current_lane(),
+            'url': result.url,
+            'bus': list(site_info.get('bus') or (site_info['bu'],)),
+            'status': result.status.name,
+            'status_code': result.status_code,
+            'method': result.method,
+            'detail': result.detail,
+            'title': result.title,
+            'note': result.note,
+            'redirects': result.redirects,
+            'fingerprint': result.fingerprint,
+        }, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.records += 1
+
+    def status(self):
+        return {'active': self.active, 'path': self.path, 'records': self.records}
+
+
+class ProbeReplayer:
+    """Feeds recorded probes back instead of touching the network.
+
+    Each URL replays its own recorded sweep sequence in order; a probe sleeps
+    for its recorded duration divided by `speed`, and cycles start at the
+    recorded gaps divided by `speed`, so scheduler, state store and API see the
+    same load shape as the recorded day, just faster. Retries only look at the
+    URL's current record, so they never shift the sweep out of step.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recorded = {}
+        self._queues = {}
+        self._served = {}
+        self._targets = []
+        self._cycle_starts = []
+        self._cycle = 0
+        self.path = None
+        self.speed = 1.0
+        self.loop = False
+        self.replayed = 0
+        self.total = 0
+
+    @property
+    def active(self):
+        return self.path is not None
+
+    def load(self, path, speed=1.0, loop=False):
+        """Read a recording; raises OSError if unreadable, ValueError if malformed"""
+        queues = {}
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    url, bus = record['url'], record['bus']
+                    Status[record['status']]
+                    float(record['ts']), float(record['duration_ms'])
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f'{path}:{number}: not a probe record ({e!r})') from None
+                # Retries are replayed from the sweep records, not queued on their own
+                if record.get('lane', LANE_SWEEP) != LANE_SWEEP:
+                    continue
+                if url not in queues:
+                    queues[url] = []
+                    entries.extend((bu, url) for bu in bus)
+                queues[url].append(record)
+
+        # The n-th sweep record of every URL belongs to cycle n; a cycle starts
+        # at the earliest of them
+        cycle_starts = []
+        for records in queues.values():
+            for cycle, record in enumerate(records):
+                if cycle == len(cycle_starts):
+                    cycle_starts.append(record['ts'])
+                else:
+                    cycle_starts[cycle] = min(cycle_starts[cycle], record['ts'])
+
+        with self._lock:
+            self._recorded = {url: tuple(records) for url, records in queues.items()}
+            self._queues = {url: deque(records) for url, records in queues.items()}
+            self._served = {}
+            self._targets = build_targets(entries)
+            self._cycle_starts = cycle_starts
+            self._cycle = 0
+            self.speed = max(0.001, float(speed))
+            self.loop = loop
+            self.replayed = 0
+            self.total = sum(len(records) for records in queues.values())
+            self.path = path
+
+    def stop(self):
+        with self._lock:
+            self.path = None
+            self._queues = {}
+            self._served = {}
+            self._targets = []
+            self._cycle_starts = []
+
+    def targets(self):
+        """Inventory seen in the recording, in first-probed order"""
+        return list(self._targets)
+
+    def scaled(self, seconds):
+        return seconds / self.speed
+
+    def next_cycle_gap(self, default):
+        """Scaled start-to-start gap from the current recorded cycle to the next one.
+
+        Falls back to `default` (scaled) past the last cycle and when wrapping
+        around in loop mode, where the recording has no gap to offer.
+        """
+        with self._lock:
+            starts = self._cycle_starts
+            cycle = self._cycle
+            self._cycle += 1
+            if self.loop and starts:
+                self._cycle %= len(starts)
+            if cycle + 1 < len(starts):
+                return self.scaled(max(0.0, starts[cycle + 1] - starts[cycle]))
+        return self.scaled(default)
+
+    def probe(self, site_info, advance=True):
+        """Recorded result for this URL, after its recorded (scaled) duration.
+
+        With advance=False (retries) the record the sweep last served for the
+        URL is returned again instead of consuming the next one.
+        """
+        url = site_info['url']
+        with self._lock:
+            queue = self._queues.get(url)
+            if queue is not None and not queue and self.loop:
+                queue.extend(self._recorded[url])
+            if not advance and url in self._served:
+                record = self._served[url]
+            elif not queue:
+                record = None
+            elif advance and (len(queue) > 1 or self.loop):
+                record = queue.popleft()
+            else:
+                # Recording ran out for this URL: hold its last known state
+                record = queue[0]
+            if record is not None and advance:
+                self._served[url] = record
+                self.replayed += 1
+
+        if record is None:
+            return CheckResult(site_info, Status.CONNECTION_FAILED, method='replay',
+                               detail='not in recording')
+
+        time.sleep(self.scaled(record['duration_ms'] / 1000))
+        redirects = record.get('redirects')
+        return CheckResult(
+            site_info, Status[record['status']], record['status_code'],
+            method=record.get('method'), detail=record.get('detail'),
+            title=record.get('title'), note=record.get('note'),
+            redirects=tuple(tuple(hop) for hop in redirects) if redirects else None,
+            fingerprint=record.get('fingerprint')
+        )
+
+    def status(self):
+        with self._lock:
+            remaining = sum(len(queue) for queue in self._queues.values())
+        return {
+            'active': self.active,
+            'path': self.path,
+            'speed': self.speed,
+            'loop': self.loop,
+            'replayed': self.replayed,
+            'remaining': remaining,
+            'total': self.total,
+            'cycles': len(self._cycle_starts),
+            'cycle': self._cycle,
+        }
+
+
+recorder = ProbeRecorder()
+replayer = ProbeReplayer()
@@ -0,0 +1,205 @@
+import sys
+import time
+from datetime import datetime
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """Outcome of a single check, stored as a small int instead of free text"""
+    OK = 0
+    HTTP_CLIENT_ERROR = 1
+    HTTP_SERVER_ERROR = 2
+    TIMEOUT = 3
+    BLOCKED = 4
+    BROWSER_FAILED = 5
+    CONNECTION_TIMEOUT = 6
+    CONNECTION_FAILED = 7
+    SSL_ERROR = 8
+    REDIRECT_BROKEN = 9
+    PAGE_NOT_READY = 10
+
+
+def intern_str(value):
+    """Intern repeated strings (BU names, hosts) so every record shares one copy"""
+    return sys.intern(value) if value else value
+
+
+def format_ts(ts):
+    """Epoch seconds -> the 'YYYY-mm-dd HH:MM:SS' strings the API has always returned"""
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def error_text(status, status_code=0, detail=None):
+    """Build the human readable error message for a status, only at the API boundary"""
+    if status == Status.OK:
+        return None
+    if status == Status.HTTP_CLIENT_ERROR:
+        return f'HTTP {status_code} - {"Forbidden" if status_code == 403 else "Client Error"}'
+    if status == Status.HTTP_SERVER_ERROR:
+        return f'HTTP {status_code} - Server Error'
+    if status == Status.TIMEOUT:
+        return 'Timeout'
+    if status == Status.BLOCKED:
+        return 'Blocked by WAF/Cloudflare'
+    if status == Status.BROWSER_FAILED:
+        return 'Selenium failed'
+    if status == Status.CONNECTION_TIMEOUT:
+        return 'Connection timeout'
+    if status == Status.SSL_ERROR:
+        return f'SSL Error: {detail}'
+    if status == Status.CONNECTION_FAILED:
+        return f'Connection failed: {detail}'
+    if status == Status.REDIRECT_BROKEN:
+        return f'Redirect broken: {detail}'
+    if status == Status.PAGE_NOT_READY:
+        return f'Page not ready: {detail}'
+    return 'Unknown'
+
+
+class CheckResult:
+    """Compact record for one website check.
+
+    Timestamps are epoch floats, the outcome is a Status code and the BU/name
+    strings are interned; nothing is formatted until to_dict() is called.
+    """
+    __slots__ = (
+        'url', 'bu', 'bus', 'name', 'status', 'status_code', 'method', 'detail',
+        'title', 'note', 'redirects', 'ready', 'fingerprint', 'timestamp', 'retry_count', 'last_retry', 'last_error',
+    )
+
+    def __init__(self, site_info, status, status_code=0, method=None,
+                 detail=None, title=None, note=None, redirects=None, fingerprint=None,
+                 timestamp=None):
+        self.url = site_info['url']
+        self.bu = intern_str(site_info['bu'])
+        self.bus = site_info.get('bus') or (self.bu,)
+        self.name = intern_str(site_info['name'])
+        self.ready = site_info.get('ready')
+        self.status = status
+        self.status_code = status_code
+        self.method = method
+        self.detail = detail
+        self.title = title
+        self.note = note
+        self.redirects = redirects  # ((status_code, url), ...) ending at the final target
+        self.fingerprint = fingerprint  # body hash, only filled while recording
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.retry_count = 0
+        self.last_retry = None
+        self.last_error = None
+
+    @property
+    def success(self):
+        return self.status == Status.OK
+
+    @property
+    def error(self):
+        return error_text(self.status, self.status_code, self.detail)
+
+    def site_info(self):
+        """The minimal site dict check_website() needs to re-probe this URL"""
+        site = {'url': self.url, 'bu': self.bu, 'bus': self.bus, 'name': self.name}
+        if self.ready:
+            site['ready'] = self.ready
+        return site
+
+    def to_dict(self):
+        """Format for JSON responses - same keys the dashboard has always read"""
+        data = {
+            'success': self.success,
+            'status_code': self.status_code,
+            'url': self.url,
+            'bu': self.bu,
+            'bus': list(self.bus),
+            'name': self.name,
+            'timestamp': format_ts(self.timestamp),
+        }
+        if not self.success:
+            data['error'] = self.error
+            data['error_class'] = self.status.name.lower()
+            data['retry_count'] = self.retry_count
+        if self.method:
+            data['method'] = self.method
+        if self.title is not None:
+            data['title'] = self.title
+        if self.note:
+            data['note'] = self.note
+        if self.redirects:
+            data['redirects'] = [{'status_code': code, 'url': hop} for code, hop in self.redirects]
+        if self.last_retry is not None:
+            data['last_retry'] = format_ts(self.last_retry)
+        if self.last_error is not None:
+            data['last_error'] = error_text(*self.last_error)
+        return data
+
+
+# Facet/filter value for results recorded without a method ('' would clash with "all")
+NO_METHOD = 'none'
+
+FAILURE_SORT_KEYS = {
+    'timestamp': lambda r: r.timestamp,
+    'url': lambda r: r.url,
+    'name': lambda r: r.name,
+    'bu': lambda r: r.bu,
+    'status_code': lambda r: r.status_code,
+    'error_class': lambda r: r.status,
+    'retry_count': lambda r: r.retry_count,
+}
+
+
+def query_failures(records, bu=None, error_class=None, method=None,
+                   sort='timestamp', order='desc', page=1, per_page=50):
+    """Filter, sort and slice failed CheckResults for one page of /api/failures.
+
+    Returns (page_records, total_matching). Records are only formatted by the
+    caller, so the response size depends on per_page, not on the outage size.
+    """
+    if bu:
+        records = [r for r in records if bu in r.bus]
+    if error_class:
+        records = [r for r in records if r.status.name.lower() == error_class]
+    if method:
+        records = [r for r in records if (r.method or NO_METHOD) == method]
+
+    key = FAILURE_SORT_KEYS.get(sort, FAILURE_SORT_KEYS['timestamp'])
+    records = sorted(records, key=key, reverse=(order != 'asc'))
+
+    start = (page - 1) * per_page
+    return records[start:start + per_page], len(records)
+
+
+def failure_facets(records):
+    """Counts per BU, error class and method for the dashboard filters"""
+    facets = {'bu': {}, 'error_class': {}, 'method': {}}
+    for r in records:
+        for bu in r.bus:
+            facets['bu'][bu] = facets['bu'].get(bu, 0) + 1
+        error_class = r.status.name.lower()
+        facets['error_class'][error_class] = facets['error_class'].get(error_class, 0) + 1
+        method = r.method or NO_METHOD
+        facets['method'][method] = facets['method'].get(method, 0) + 1
+    return facets
+
+
+def parse_failure_query(args):
+    """Read /api/failures query-string arguments with sane bounds"""
+    def as_int(name, default, low, high):
+        try:
+            value = int(args.get(name, default))
+        except (TypeError, ValueError):
+            value = default
+        return max(low, min(high, value))
+
+    since_version = args.get('since_version')
+    return {
+        'bu': args.get('bu') or None,
+        'error_class': (args.get('error_class') or '').lower() or None,
+        'method': args.get('method') or None,
+        'sort': args.get('sort', 'timestamp'),
+        'order': 'asc' if args.get('order') == 'asc' else 'desc',
+        'page': as_int('page', 1, 1, 1_000_000),
+        'per_page': as_int('per_page', 50, 1, 500),
+        'since_version': int(since_version) if since_version and since_version.isdigit() else None,
+    }
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from profiling import tracer
+
+# Lanes in the order they are served
+LANE_INTERACTIVE = 'interactive'  # operator clicked Retry
+LANE_RECHECK = 'recheck'  # retry-all and other scheduled re-checks
+LANE_SWEEP = 'sweep'  # the background cycle
+LANES = (LANE_INTERACTIVE, LANE_RECHECK, LANE_SWEEP)
+
+_current = threading.local()
+
+
+def current_lane():
+    """Lane of the job running on this thread (sweep for threads outside the scheduler)"""
+    return getattr(_current, 'lane', LANE_SWEEP)
+
+
+class ProbeScheduler:
+    """Shared worker pool with priority lanes.
+
+    Interactive jobs are always served first and can use every worker;
+    bulk lanes (recheck, sweep) are capped at workers - reserved_workers so a
+    few workers are always free for an operator's retry. Chrome instances are
+    split the same way through browser_slot().
+    """
+
+    def __init__(self, workers=12, reserved_workers=2, browser_slots=3, reserved_browsers=1):
+        self.workers = workers
+        self.bulk_worker_limit = max(1, workers - reserved_workers)
+        self.browser_slots = browser_slots
+        self.bulk_browser_limit = max(1, browser_slots - reserved_browsers)
+
+        self._cond = threading.Condition()
+        self._queues = {lane: deque() for lane in LANES}
+        self._bulk_running = 0
+        self._running = {lane: 0 for lane in LANES}
+        self._browsers_in_use = 0
+        self._bulk_browsers_in_use = 0
+        self._threads = []
+        self._stats = {lane: deque(maxlen=500) for lane in LANES}  # (wait, total) seconds
+        self._completed = {lane: 0 for lane in LANES}
+
+    def submit(self, lane, fn, *args, **kwargs):
+        """Queue fn on a lane and return a concurrent.futures.Future
+
+        The caller's open trace (if tracing) travels with the job, so the
+        queue wait and the job's own spans are recorded in it.
+        """
+        future = Future()
+        job = (future, fn, args, kwargs, time.perf_counter(), tracer.current())
+        with self._cond:
+            self._start_workers()
+            self._queues[lane].append(job)
+            self._cond.notify_all()
+        return future
+
+    def _start_workers(self):
+        # Threads are created on first use so importing the app stays cheap
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, daemon=True,
+                                 name=f'probe-{len(self._threads)}')
+            self._threads.append(t)
+            t.start()
+
+    def _next_job(self):
+        if self._queues[LANE_INTERACTIVE]:
+            return LANE_INTERACTIVE, self._queues[LANE_INTERACTIVE].popleft()
+        if self._bulk_running < self.bulk_worker_limit:
+            for lane in (LANE_RECHECK, LANE_SWEEP):
+                if self._queues[lane]:
+                    return lane, self._queues[lane].popleft()
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                lane, job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    lane, job = self._next_job()
+                self._running[lane] += 1
+                if lane != LANE_INTERACTIVE:
+                    self._bulk_running += 1
+
+            future, fn, args, kwargs, enqueued, trace = job
+            started = time.perf_counter()
+            tracer.add_span(trace, 'queue_wait', enqueued, started - enqueued)
+            _current.lane = lane
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        with tracer.attach(trace):
+                            future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                _current.lane = LANE_SWEEP
+                finished = time.perf_counter()
+                with self._cond:
+                    self._running[lane] -= 1
+                    if lane != LANE_INTERACTIVE:
+                        self._bulk_running -= 1
+                    self._stats[lane].append((started - enqueued, finished - enqueued))
+                    self._completed[lane] += 1
+                    self._cond.notify_all()
+
+    @contextmanager
+    def browser_slot(self):
+        """Hold one Chrome slot; bulk lanes cannot take the reserved ones"""
+        bulk = current_lane() != LANE_INTERACTIVE
+        with self._cond:
+            while (self._browsers_in_use >= self.browser_slots or
+                   (bulk and self._bulk_browsers_in_use >= self.bulk_browser_limit)):
+                self._cond.wait()
+            self._browsers_in_use += 1
+            if bulk:
+                self._bulk_browsers_in_use += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._browsers_in_use -= 1
+                if bulk:
+                    self._bulk_browsers_in_use -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        """Queue depth, running jobs and latency per lane, in milliseconds"""
+        def ms(values, pct):
+            if not values:
+                return None
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(len(values) * pct))] * 1000, 1)
+
+        with self._cond:
+            lanes = {}
+            for lane in LANES:
+                samples = list(self._stats[lane])
+                waits = [w for w, _ in samples]
+                totals = [t for _, t in samples]
+                lanes[lane] = {
+                    'queued': len(self._queues[lane]),
+                    'running': self._running[lane],
+                    'completed': self._completed[lane],
+                    'wait_p50_ms': ms(waits, 0.5),
+                    'wait_p95_ms': ms(waits, 0.95),
+                    'latency_p50_ms': ms(totals, 0.5),
+                    'latency_p95_ms': ms(totals, 0.95),
+                }
+            return {
+                'workers': self.workers,
+                'bulk_worker_limit': self.bulk_worker_limit,
+                'browser_slots': self.browser_slots,
+                'browsers_in_use': self._browsers_in_use,
+                'lanes': lanes,
+            }